@@ -1,84 +1,383 @@
 #!/usr/bin/env python3
 import os
-import subprocess
+import sys
 import argparse
-import tempfile
+import ctypes
+import ctypes.util
+import mmap
 from pathlib import Path
 import time
-import statistics
+from array import array
+import math
+import heapq
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 
-def run_xxd_diff(file1, file2):
-    """Run xxd diff between two files and return the diffstat output."""
+# xxd prints 16 bytes per line; files are read in blocks of whole lines
+LINE_SIZE = 16
+BLOCK_SIZE = 64 * 1024
+# Below this size differing blocks are scanned line by line instead of halved
+BISECT_MIN_SIZE = 256
+# Differing blocks up to this size with changes in both halves are counted in one pass
+DENSE_BLOCK_SIZE = 4096
+# Chunk size for the identical-content check
+COMPARE_CHUNK_SIZE = 128 * 1024
+# Equal-sized files at least this large are compared through mmap and memcmp
+MMAP_MIN_SIZE = 1024 * 1024
+# With --fast-scan, equal-sized files at least this large are only sampled
+FAST_SCAN_MIN_SIZE = 1024 * 1024
+FAST_SCAN_SAMPLE_SIZE = 4096
+# Number of files handed to a worker process per task
+COMPARE_BATCH_SIZE = 64
+# Tree lines are buffered up to this many lines or seconds before being written
+OUTPUT_BATCH_LINES = 1024
+OUTPUT_FLUSH_INTERVAL = 0.2
+
+# Tree drawing pieces
+ROOT_PREFIX = "    "
+INDENT = "│   "
+LAST_INDENT = "    "
+CONNECTOR = "├── "
+LAST_CONNECTOR = "└── "
+
+def load_memcmp():
+    """Return libc's memcmp through ctypes, or None if it cannot be loaded."""
     try:
-        # Create temporary files for the xxd outputs
-        with tempfile.NamedTemporaryFile() as temp1, tempfile.NamedTemporaryFile() as temp2:
-            # Run xxd on both files
-            subprocess.run(["xxd", file1], stdout=temp1, check=True)
-            subprocess.run(["xxd", file2], stdout=temp2, check=True)
-            
-            # Flush to ensure all data is written
-            temp1.flush()
-            temp2.flush()
-            
-            # Run diff and diffstat on the xxd outputs
-            diff_process = subprocess.Popen(
-                ["diff", temp1.name, temp2.name],
-                stdout=subprocess.PIPE
-            )
-            
-            diffstat_process = subprocess.run(
-                ["diffstat"],
-                stdin=diff_process.stdout,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            
-            return diffstat_process.stdout.strip()
-    except subprocess.CalledProcessError:
-        return "Error comparing files"
+        memcmp = ctypes.CDLL(ctypes.util.find_library("c")).memcmp
+    except (OSError, AttributeError, TypeError):
+        return None
+    memcmp.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    memcmp.restype = ctypes.c_int
+    return memcmp
 
-def parse_diffstat(diffstat_output):
-    """Parse the diffstat output to extract insertions and deletions."""
-    if "0 files changed" in diffstat_output:
-        return 0, 0
+MEMCMP = load_memcmp()
+
+def line_count(size):
+    """Return the number of xxd lines needed for size bytes."""
+    return (size + LINE_SIZE - 1) // LINE_SIZE
+
+def count_differing_lines_dense(block1, block2):
+    """Count the 16-byte lines that differ between two equal-length blocks in one pass.
+
+    The blocks are XORed as big integers, so differing bytes are non-zero;
+    OR-ing the 16 byte columns of the result leaves one byte per line that
+    is zero only if the whole line matched.
+    """
+    size = len(block1)
+    lines = line_count(size)
+    xored = (int.from_bytes(block1, "little") ^ int.from_bytes(block2, "little")).to_bytes(size, "little")
+    
+    columns = 0
+    for column in range(LINE_SIZE):
+        columns |= int.from_bytes(xored[column::LINE_SIZE], "little")
+    
+    return lines - columns.to_bytes(lines, "little").count(0)
+
+def count_differing_lines(block1, block2):
+    """Count the 16-byte lines that differ between two equal-length blocks.
+
+    Halves that compare equal are skipped with a single memcmp, so only the
+    regions around actual differences are scanned line by line. Small
+    blocks with differences in both halves are likely to be densely
+    changed and are counted in one pass instead.
+    """
+    if block1 == block2:
+        return 0
+    
+    size = len(block1)
+    if size <= BISECT_MIN_SIZE:
+        return sum(
+            1 for i in range(0, size, LINE_SIZE)
+            if block1[i:i + LINE_SIZE] != block2[i:i + LINE_SIZE]
+        )
     
-    # Try to extract insertions and deletions
+    half = size // 2 - (size // 2) % LINE_SIZE
+    left1, left2 = block1[:half], block2[:half]
+    right1, right2 = block1[half:], block2[half:]
+    if size <= DENSE_BLOCK_SIZE and left1 != left2 and right1 != right2:
+        return count_differing_lines_dense(block1, block2)
+    
+    return count_differing_lines(left1, left2) + count_differing_lines(right1, right2)
+
+def count_line_changes(f1, f2):
+    """Count xxd line (insertions, deletions) from the current position of two open files.
+
+    xxd prefixes every line with its offset, so a line-based diff of two
+    hex dumps can only ever match lines at the same offset. Counting the
+    differing 16-byte chunks directly gives the same numbers without
+    spawning xxd, diff and diffstat. Both files must be positioned at the
+    same line-aligned offset.
+    """
     insertions, deletions = 0, 0
+    while True:
+        block1 = f1.read(BLOCK_SIZE)
+        block2 = f2.read(BLOCK_SIZE)
+        if not block1 and not block2:
+            break
+        if block1 == block2:
+            continue
+        
+        # Chunks present in both blocks replace each other. A partial
+        # last line only matches if both blocks end at the same length.
+        common = min(len(block1), len(block2))
+        full = common - common % LINE_SIZE
+        changed = count_differing_lines(block1[:full], block2[:full])
+        if full < common and block1[full:full + LINE_SIZE] != block2[full:full + LINE_SIZE]:
+            changed += 1
+        insertions += changed
+        deletions += changed
+        
+        # Trailing chunks only exist in the longer file
+        deletions += line_count(len(block1)) - line_count(common)
+        insertions += line_count(len(block2)) - line_count(common)
     
-    if "insertion" in diffstat_output:
+    return insertions, deletions
+
+def first_difference(f1, f2):
+    """Return the offset of the first differing chunk of two open files, or None if identical."""
+    offset = 0
+    while True:
+        chunk1 = f1.read(COMPARE_CHUNK_SIZE)
+        chunk2 = f2.read(COMPARE_CHUNK_SIZE)
+        if chunk1 != chunk2:
+            return offset
+        if not chunk1:
+            return None
+        offset += len(chunk1)
+
+def first_difference_mapped(f1, f2, size):
+    """Like first_difference, but memcmp the mapped files instead of reading them.
+
+    Copy-on-write mappings are used because ctypes can only take the
+    address of a writable buffer; nothing is ever written to them.
+    """
+    if hasattr(os, "posix_fadvise"):
+        os.posix_fadvise(f1.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(f2.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    
+    with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_COPY) as map1, \
+            mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_COPY) as map2:
+        buffer1 = ctypes.c_char.from_buffer(map1)
+        buffer2 = ctypes.c_char.from_buffer(map2)
         try:
-            ins_part = diffstat_output.split("insertion")[0]
-            insertions = int(ins_part.split(",")[-1].strip())
-        except (ValueError, IndexError):
-            pass
+            address1 = ctypes.addressof(buffer1)
+            address2 = ctypes.addressof(buffer2)
+            for offset in range(0, size, COMPARE_CHUNK_SIZE):
+                length = min(COMPARE_CHUNK_SIZE, size - offset)
+                if MEMCMP(address1 + offset, address2 + offset, length) != 0:
+                    return offset
+            return None
+        finally:
+            # The mappings cannot be closed while ctypes still exports them
+            del buffer1, buffer2
+
+def samples_match(f1, f2, size):
+    """Return True if the start, middle and end of two equal-sized files are identical."""
+    for offset in (0, size // 2, size - FAST_SCAN_SAMPLE_SIZE):
+        f1.seek(offset)
+        f2.seek(offset)
+        if f1.read(FAST_SCAN_SAMPLE_SIZE) != f2.read(FAST_SCAN_SAMPLE_SIZE):
+            f1.seek(0)
+            f2.seek(0)
+            return False
+    return True
+
+def compare_pair(file1, file2, fast_scan=False):
+    """Return (insertions, deletions) between two files, skipping identical ones.
+
+    Each file is opened once: equal-sized files are compared chunk by chunk
+    and, on the first mismatch, counting resumes from that chunk rather
+    than re-reading the identical prefix.
+    
+    With fast_scan, large equal-sized files whose start, middle and end
+    match are reported as unchanged without reading the rest. This misses
+    changes confined to the unsampled regions.
+    """
+    try:
+        with open(file1, "rb") as f1, open(file2, "rb") as f2:
+            size = os.fstat(f1.fileno()).st_size
+            if size == os.fstat(f2.fileno()).st_size:
+                if fast_scan and size >= FAST_SCAN_MIN_SIZE and samples_match(f1, f2, size):
+                    return 0, 0
+                if MEMCMP is not None and size >= MMAP_MIN_SIZE:
+                    try:
+                        offset = first_difference_mapped(f1, f2, size)
+                    except (OSError, ValueError):
+                        offset = first_difference(f1, f2)
+                else:
+                    offset = first_difference(f1, f2)
+                if offset is None:
+                    return 0, 0
+                f1.seek(offset)
+                f2.seek(offset)
+            return count_line_changes(f1, f2)
+    except OSError:
+        return 0, 0
+
+def dir_prefix(directory):
+    """Return directory with a single trailing separator, so relative paths can be appended."""
+    return directory.rstrip(os.sep) + os.sep
+
+def compare_batch(dir1, dir2, file_paths, fast_scan=False):
+    """Compare a batch of relative paths present in both directories."""
+    prefix1 = dir_prefix(dir1)
+    prefix2 = dir_prefix(dir2)
+    return [
+        (file_path, compare_pair(prefix1 + file_path, prefix2 + file_path, fast_scan))
+        for file_path in file_paths
+    ]
+
+def compare_all(dir1, dir2, common_files, backend="processes", jobs=1, fast_scan=False):
+    """Compare files present in both directories, yielding (path, changes) in input order.
+
+    backend is "sync" to compare in this process, "threads" for a thread
+    pool (enough when files are mostly skipped as identical, which is I/O
+    bound) or "processes" for a process pool.
+    """
+    if backend == "sync" or jobs <= 1:
+        for file_path in common_files:
+            yield from compare_batch(dir1, dir2, [file_path], fast_scan)
+        return
+    
+    # Hand files to the workers in batches so that each task amortises the
+    # cost of pickling and scheduling over many small files
+    batches = [
+        common_files[i:i + COMPARE_BATCH_SIZE]
+        for i in range(0, len(common_files), COMPARE_BATCH_SIZE)
+    ]
+    executor_class = ThreadPoolExecutor if backend == "threads" else ProcessPoolExecutor
+    with executor_class(max_workers=jobs) as executor:
+        for results in executor.map(
+            compare_batch, repeat(dir1), repeat(dir2), batches, repeat(fast_scan)
+        ):
+            yield from results
+
+def inode_order(directory, file_paths):
+    """Sort relative paths by the (device, inode) of the files in directory.
+
+    On rotational storage inode order roughly follows on-disk layout, so
+    reading files in this order turns random seeks into sequential reads.
+    """
+    prefix = dir_prefix(directory)
     
-    if "deletion" in diffstat_output:
+    def inode_key(file_path):
         try:
-            del_part = diffstat_output.split("deletion")[0]
-            if "insertion" in del_part:
-                del_part = del_part.split(",")[-2]
-            else:
-                del_part = del_part.split(",")[-1]
-            deletions = int(del_part.strip())
-        except (ValueError, IndexError):
-            pass
+            stat = os.stat(prefix + file_path)
+        except OSError:
+            return 0, 0
+        return stat.st_dev, stat.st_ino
     
-    return insertions, deletions
+    return sorted(file_paths, key=inode_key)
+
+def in_path_order(results, file_paths):
+    """Yield (path, changes) from results in the order of file_paths."""
+    pending = {}
+    for file_path in file_paths:
+        while file_path not in pending:
+            result_path, changes = next(results)
+            pending[result_path] = changes
+        yield file_path, pending.pop(file_path)
+
+def walk_files(directory, prefix=""):
+    """Yield the paths of all files below directory, relative to it and prepended with prefix.
+
+    Like os.walk, symlinks to directories are neither followed nor reported
+    and unreadable directories are skipped.
+    """
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return
+    
+    sep = os.sep
+    with entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                yield prefix + entry.name
+            elif not entry.is_symlink():
+                yield from walk_files(entry.path, prefix + entry.name + sep)
 
 def get_all_files(directory):
     """Get all files in a directory recursively with their relative paths."""
-    files = set()
-    for root, _, filenames in os.walk(directory):
-        for filename in filenames:
-            full_path = os.path.join(root, filename)
-            rel_path = os.path.relpath(full_path, directory)
-            files.add(rel_path)
-    return files
-
-def build_directory_tree(dir1, dir2):
-    """Build a directory tree structure with file status information."""
-    # Get all files from both directories
+    return set(walk_files(directory))
+
+def sibling_flags(paths):
+    """Return which parts of sorted paths are the last child of their parent.
+
+    The flags of all paths are packed into one bytearray, one byte per
+    path part; the parts of paths[i] start at offsets[i] and end at
+    offsets[i + 1]. Paths sharing a directory are contiguous once sorted,
+    so a single pass from the end knows whether another sibling follows.
+    """
+    sep = os.sep
+    offsets = array("Q", [0])
+    for path in paths:
+        offsets.append(offsets[-1] + path.count(sep) + 1)
+    flags = bytearray(offsets[-1])
+    next_parts, next_start = [], 0
+    
+    for i in range(len(paths) - 1, -1, -1):
+        parts = paths[i].split(sep)
+        start = offsets[i]
+        common = 0
+        while common < min(len(parts), len(next_parts)) and parts[common] == next_parts[common]:
+            common += 1
+        
+        # Shared ancestors are the same nodes as in the next path; the first
+        # differing part has a following sibling, deeper parts do not
+        flags[start:start + common] = flags[next_start:next_start + common]
+        if common < len(parts):
+            flags[start + common] = not next_parts
+            flags[start + common + 1:start + len(parts)] = b"\x01" * (len(parts) - common - 1)
+        
+        next_parts, next_start = parts, start
+    
+    return flags, offsets
+
+def format_tree_entry(parts, is_last, prev_dirs, status, changes, out):
+    """Append the lines for the directories opened by a file and the file itself to out."""
+    dirs = parts[:-1]
+    common = 0
+    while common < min(len(dirs), len(prev_dirs)) and dirs[common] == prev_dirs[common]:
+        common += 1
+    
+    for depth in range(common, len(parts)):
+        prefix = ROOT_PREFIX + "".join(
+            LAST_INDENT if last else INDENT for last in is_last[:depth]
+        )
+        connector = LAST_CONNECTOR if is_last[depth] else CONNECTOR
+        
+        if depth < len(dirs):
+            out.append(f"{prefix}{connector}{parts[depth]}/\n")
+            continue
+        
+        status_indicator = ""
+        if status == "added":
+            status_indicator = "[+] "
+        elif status == "removed":
+            status_indicator = "[-] "
+        elif status == "changed":
+            ins, dels = changes
+            change_parts = []
+            if ins > 0:
+                change_parts.append(f"+{ins}")
+            if dels > 0:
+                change_parts.append(f"-{dels}")
+            change_str = ", ".join(change_parts)
+            status_indicator = f"[~] ({change_str}) "
+        
+        out.append(f"{prefix}{connector}{status_indicator}{parts[depth]}\n")
+
+def scan_directories(dir1, dir2):
+    """List both directories and split their files by presence.
+
+    Returns all files, added files, removed files and common files; all
+    files and common files are sorted by path.
+    """
     print("Scanning directories...")
     files1 = get_all_files(dir1)
     files2 = get_all_files(dir2)
@@ -92,187 +391,145 @@ def build_directory_tree(dir1, dir2):
     common_files = files1 & files2
     
     print(f"Added: {len(added_files)}, Removed: {len(removed_files)}, Common: {len(common_files)}")
-    print("\nComparing files...")
-    
-    # Build a tree structure
-    tree = {}
-    all_files = sorted(files1 | files2)
-    
-    total_files = len(all_files)
-    processed = 0
-    
-    # Track files with changes for statistical analysis
-    changed_files_data = []
-    
-    for file_path in all_files:
-        parts = file_path.split(os.sep)
-        current = tree
-        
-        # Build directory structure
-        for i, part in enumerate(parts):
-            if i == len(parts) - 1:  # This is a file
-                # Determine file status
-                if file_path in added_files:
-                    status = "added"
-                    changes = (0, 0)
-                elif file_path in removed_files:
-                    status = "removed"
-                    changes = (0, 0)
-                else:
-                    processed += 1
-                    print(f"Comparing [{processed}/{total_files}]: {file_path}")
-                    file1_path = os.path.join(dir1, file_path)
-                    file2_path = os.path.join(dir2, file_path)
-                    diffstat_output = run_xxd_diff(file1_path, file2_path)
-                    insertions, deletions = parse_diffstat(diffstat_output)
-                    
-                    if insertions > 0 or deletions > 0:
-                        status = "changed"
-                        changes = (insertions, deletions)
-                        # Track this file for statistical analysis
-                        changed_files_data.append({
-                            "path": file_path,
-                            "insertions": insertions,
-                            "deletions": deletions,
-                            "total_changes": insertions + deletions
-                        })
-                    else:
-                        status = "unchanged"
-                        changes = (0, 0)
-                
-                current[part] = {"type": "file", "status": status, "changes": changes}
-            else:  # This is a directory
-                if part not in current:
-                    current[part] = {"type": "dir", "children": {}}
-                current = current[part]["children"]
     
-    return tree, changed_files_data
+    return sorted(files1 | files2), added_files, removed_files, sorted(common_files)
 
-def print_tree(tree, prefix="", is_last=True, is_root=True):
-    """Print the directory tree with visual indicators."""
-    if is_root:
-        print("\nDirectory Tree:")
-        print("└── Root")
-        prefix = "    "
-    
-    items = list(tree.items())
-    
-    for i, (name, node) in enumerate(items):
-        is_last_item = i == len(items) - 1
-        
-        # Determine the connector and next prefix
-        if is_last_item:
-            connector = "└── "
-            next_prefix = prefix + "    "
+def compare_files(dir1, dir2, common_files, backend="processes", jobs=1, scan_order="path",
+                  fast_scan=False):
+    """Compare the sorted common files, yielding (path, changes) in path order."""
+    # Files may be read in inode order, but the tree is always printed in path order
+    if scan_order == "inode":
+        compare_order = inode_order(dir1, common_files)
+    else:
+        compare_order = common_files
+    return in_path_order(
+        compare_all(dir1, dir2, compare_order, backend, jobs, fast_scan), common_files
+    )
+
+def build_directory_tree(all_files, added_files, removed_files, results=None, top=None):
+    """Print the directory tree as file results come in.
+
+    results yields (path, changes) for the common files in path order, as
+    returned by compare_files; without results common files are listed as
+    not compared. Only the sorted list of paths is kept in memory; each
+    file is printed as soon as its result is available. Returns the file
+    counts by status and running statistics of changed files (see
+    new_change_stats).
+    """
+    flags, offsets = sibling_flags(all_files)
+    
+    print("\nDirectory Tree:")
+    print(f"{LAST_CONNECTOR}Root")
+    
+    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0, "common": 0}
+    # Track files with changes for statistical analysis
+    change_stats = new_change_stats(top)
+    prev_dirs = []
+    sep = os.sep
+    
+    # Write tree lines in batches, but often enough that slow comparisons
+    # still show progress
+    out = []
+    last_flush = time.monotonic()
+    
+    for index, file_path in enumerate(all_files):
+        is_last = flags[offsets[index]:offsets[index + 1]]
+        changes = (0, 0)
+        if file_path in added_files:
+            status = "added"
+        elif file_path in removed_files:
+            status = "removed"
+        elif results is None:
+            status = "common"
         else:
-            connector = "├── "
-            next_prefix = prefix + "│   "
+            _, changes = next(results)
+            insertions, deletions = changes
+            if insertions > 0 or deletions > 0:
+                status = "changed"
+                record_change(change_stats, {
+                    "path": file_path,
+                    "insertions": insertions,
+                    "deletions": deletions,
+                    "total_changes": insertions + deletions
+                })
+            else:
+                status = "unchanged"
         
-        # Print the current node
-        if node["type"] == "file":
-            status_indicator = ""
-            if node["status"] == "added":
-                status_indicator = "[+] "
-            elif node["status"] == "removed":
-                status_indicator = "[-] "
-            elif node["status"] == "changed":
-                ins, dels = node["changes"]
-                changes = []
-                if ins > 0:
-                    changes.append(f"+{ins}")
-                if dels > 0:
-                    changes.append(f"-{dels}")
-                change_str = ", ".join(changes)
-                status_indicator = f"[~] ({change_str}) "
-            
-            print(f"{prefix}{connector}{status_indicator}{name}")
-        else:  # It's a directory
-            print(f"{prefix}{connector}{name}/")
-            print_tree(node["children"], next_prefix, is_last_item, False)
-
-def count_status(tree):
-    """Count files by status in the tree."""
-    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
-    
-    def count_recursive(node):
-        if node["type"] == "file":
-            counts[node["status"]] += 1
-        else:
-            for child in node["children"].values():
-                count_recursive(child)
+        counts[status] += 1
+        parts = file_path.split(sep)
+        format_tree_entry(parts, is_last, prev_dirs, status, changes, out)
+        prev_dirs = parts[:-1]
+        
+        if len(out) >= OUTPUT_BATCH_LINES or time.monotonic() - last_flush >= OUTPUT_FLUSH_INTERVAL:
+            sys.stdout.write("".join(out))
+            out.clear()
+            last_flush = time.monotonic()
     
-    for node in tree.values():
-        count_recursive(node)
+    sys.stdout.write("".join(out))
     
-    return counts
+    return counts, change_stats
 
-def identify_significant_changes(changed_files_data, threshold_multiplier=2.0):
+def new_change_stats(top=None):
+    """Return empty running statistics for changed files.
+
+    Only the top files by total changes are kept as candidates for the
+    significant-changes report; with top=None every changed file is kept.
+    """
+    return {"count": 0, "mean": 0.0, "m2": 0.0, "top": top, "candidates": []}
+
+def record_change(change_stats, file_data):
+    """Add a changed file to the running statistics (Welford's algorithm)."""
+    total = file_data["total_changes"]
+    change_stats["count"] += 1
+    delta = total - change_stats["mean"]
+    change_stats["mean"] += delta / change_stats["count"]
+    change_stats["m2"] += delta * (total - change_stats["mean"])
+    
+    # Ties are broken by arrival order, so the heap evicts later paths first
+    entry = (total, -change_stats["count"], file_data)
+    candidates = change_stats["candidates"]
+    if change_stats["top"] is None:
+        candidates.append(entry)
+    elif len(candidates) < change_stats["top"]:
+        heapq.heappush(candidates, entry)
+    else:
+        heapq.heappushpop(candidates, entry)
+
+def identify_significant_changes(change_stats, threshold_multiplier=2.0):
     """Identify files with significantly more changes than average."""
-    if not changed_files_data:
+    count = change_stats["count"]
+    if not count:
         return []
     
-    # Calculate statistics
-    total_changes = [file_data["total_changes"] for file_data in changed_files_data]
-    
-    try:
-        mean_changes = statistics.mean(total_changes)
-        stdev_changes = statistics.stdev(total_changes) if len(total_changes) > 1 else 0
-    except statistics.StatisticsError:
-        return []
+    mean_changes = change_stats["mean"]
+    stdev_changes = math.sqrt(change_stats["m2"] / (count - 1)) if count > 1 else 0
     
     # Set threshold as mean + (multiplier * stdev)
     threshold = mean_changes + (threshold_multiplier * stdev_changes)
     
-    # Find files with changes above threshold
+    # Find files with changes above threshold, sorted by total changes (descending)
     significant_files = [
-        file_data for file_data in changed_files_data
-        if file_data["total_changes"] > threshold
+        file_data for total, _, file_data in sorted(change_stats["candidates"], reverse=True)
+        if total > threshold
     ]
     
-    # Sort by total changes (descending)
-    significant_files.sort(key=lambda x: x["total_changes"], reverse=True)
-    
     return significant_files, mean_changes, threshold
 
-def main():
-    parser = argparse.ArgumentParser(description="Compare files between two directories")
-    parser.add_argument("dir1", help="First directory (older)")
-    parser.add_argument("dir2", help="Second directory (newer)")
-    parser.add_argument("--threshold", type=float, default=2.0, 
-                        help="Multiplier for standard deviation to identify significant changes (default: 2.0)")
-    args = parser.parse_args()
-    
-    # Check if directories exist
-    if not os.path.isdir(args.dir1):
-        print(f"Error: {args.dir1} is not a directory")
-        return 1
-    
-    if not os.path.isdir(args.dir2):
-        print(f"Error: {args.dir2} is not a directory")
-        return 1
-    
-    print(f"Comparing directories:")
-    print(f"  Old: {args.dir1}")
-    print(f"  New: {args.dir2}")
-    
-    start_time = time.time()
-    
-    # Build and print the directory tree
-    tree, changed_files_data = build_directory_tree(args.dir1, args.dir2)
-    print_tree(tree)
-    
-    # Print summary
-    counts = count_status(tree)
+def print_report(counts, change_stats, threshold_multiplier=2.0):
+    """Print the summary counts and the files with significant changes."""
     print("\nSummary:")
     print(f"  Added files:     {counts['added']}")
     print(f"  Removed files:   {counts['removed']}")
-    print(f"  Changed files:   {counts['changed']}")
-    print(f"  Unchanged files: {counts['unchanged']}")
+    if counts["common"]:
+        print(f"  Common files:    {counts['common']} (not compared)")
+    else:
+        print(f"  Changed files:   {counts['changed']}")
+        print(f"  Unchanged files: {counts['unchanged']}")
     
     # Identify and print files with significant changes
-    if changed_files_data:
+    if change_stats["count"]:
         significant_files, mean_changes, threshold = identify_significant_changes(
-            changed_files_data, args.threshold
+            change_stats, threshold_multiplier
         )
         
         if significant_files:
@@ -290,6 +547,73 @@ def main():
                 print(f"    Changes: {total} total (+{ins}, -{dels})")
                 print(f"    {total/mean_changes:.1f}x the average change rate")
                 print()
+
+def parse_args():
+    """Parse the command line arguments."""
+    parser = argparse.ArgumentParser(description="Compare files between two directories")
+    parser.add_argument("dir1", help="First directory (older)")
+    parser.add_argument("dir2", help="Second directory (newer)")
+    parser.add_argument("--threshold", type=float, default=2.0, 
+                        help="Multiplier for standard deviation to identify significant changes (default: 2.0)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of workers used to compare files (default: CPU count)")
+    parser.add_argument("--io-backend", choices=["sync", "threads", "processes"], default="processes",
+                        help="How files are compared: in this process, in a thread pool or in a "
+                             "process pool (default: processes)")
+    parser.add_argument("--scan-order", choices=["path", "inode"], default="path",
+                        help="Order in which files are read; inode reduces seeks on rotational disks (default: path)")
+    parser.add_argument("--top", type=int, default=None,
+                        help="Only keep and report up to N significantly changed files (default: all)")
+    parser.add_argument("--fast-scan", action="store_true",
+                        help="Treat large equal-sized files as unchanged if their start, middle and end match "
+                             "(faster, but may miss changes elsewhere in the file)")
+    parser.add_argument("--no-diff", action="store_true",
+                        help="Only compare the directory structure, without reading file contents")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    
+    # Check if directories exist
+    if not os.path.isdir(args.dir1):
+        print(f"Error: {args.dir1} is not a directory")
+        return 1
+    
+    if not os.path.isdir(args.dir2):
+        print(f"Error: {args.dir2} is not a directory")
+        return 1
+    
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1")
+        return 1
+    
+    if args.top is not None and args.top < 1:
+        print("Error: --top must be at least 1")
+        return 1
+    
+    print(f"Comparing directories:")
+    print(f"  Old: {args.dir1}")
+    print(f"  New: {args.dir2}")
+    if not args.no_diff:
+        print(f"  Backend: {args.io_backend} ({args.jobs} jobs)")
+    
+    start_time = time.time()
+    
+    all_files, added_files, removed_files, common_files = scan_directories(args.dir1, args.dir2)
+    
+    results = None
+    if not args.no_diff:
+        print("\nComparing files...")
+        results = compare_files(
+            args.dir1, args.dir2, common_files, args.io_backend, args.jobs,
+            args.scan_order, args.fast_scan
+        )
+    
+    # Print the tree as files are compared
+    counts, change_stats = build_directory_tree(
+        all_files, added_files, removed_files, results, args.top
+    )
+    print_report(counts, change_stats, args.threshold)
     
     elapsed_time = time.time() - start_time
     print(f"\nComparison completed in {elapsed_time:.2f} seconds")